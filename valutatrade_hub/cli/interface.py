@@ -1,7 +1,5 @@
-import json
 import logging
-from pathlib import Path
-from valutatrade_hub.core.usecases import register, login, deposit, buy, sell, get_rate_usecase
+from valutatrade_hub.core.usecases import register, login, deposit, buy, sell, get_rate_usecase, get_user_portfolio
 from valutatrade_hub.core.exceptions import InsufficientFundsError, CurrencyNotFoundError, ApiRequestError
 from valutatrade_hub.parser_service.config import ParserConfig
 from valutatrade_hub.parser_service.api_clients import CoinGeckoClient, ExchangeRateApiClient
@@ -9,26 +7,14 @@ from valutatrade_hub.parser_service.storage import RatesStorage
 from valutatrade_hub.parser_service.updater import RatesUpdater
 from valutatrade_hub.core.utils import RatesCache
 from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.logging_config import setup_logging
 logger = logging.getLogger(__name__)
 
 current_user = None
 SUPPORTED_CURRENCIES = ["USD", "EUR", "RUB", "BTC", "ETH"]
 ttl_seconds = SettingsLoader().get("RATES_CACHE_TTL", 3600)
-PORTFOLIO_FILE = Path("data/portfolios.json")
-cache = RatesCache(ttl_seconds=ttl_seconds)
-
-def get_user_portfolio(user_id: int):
-    if not PORTFOLIO_FILE.exists():
-        return {"user_id": user_id, "wallets": {}}
-
-    with open(PORTFOLIO_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for user in data:
-        if user["user_id"] == user_id:
-            return user
-
-    return {"user_id": user_id, "wallets": {}}
+# один кэш курсов на процесс: его используют и show-portfolio, и update-rates
+cache = RatesCache(file_path=ParserConfig().RATES_FILE_PATH, ttl_seconds=ttl_seconds)
 
 def show_portfolio(base_currency: str = "USD"):
     global current_user
@@ -37,32 +23,27 @@ def show_portfolio(base_currency: str = "USD"):
         return
 
     user_id = current_user["user_id"]
-    user_portfolio = get_user_portfolio(user_id)
-    wallets = user_portfolio.get("wallets", {})
+    wallets = get_user_portfolio(user_id)
 
     print(f"\nПортфель пользователя '{current_user['username']}' (база: {base_currency}):")
     total = 0.0
+    rates = cache.get_rates(wallets, base_currency)
 
     for code, wallet in wallets.items():
         amount = wallet.get("balance", 0.0)
-        converted = amount
-        try:
-            if code != base_currency:
-                pair = cache.get_pair(code, base_currency)
-                if not pair:
-                    raise CurrencyNotFoundError(f"Курс {code}->{base_currency} не найден или устарел")
-                converted = amount * pair["rate"]
-            print(f"- {code}: {amount:.4f}  → {converted:.2f} {base_currency}")
-            total += converted
-        except CurrencyNotFoundError:
+        rate = rates[code]
+        if rate is None:
             print(f"- {code}: {amount:.4f}  → ??? {base_currency} (курс отсутствует)")
+            continue
+        converted = amount * rate
+        print(f"- {code}: {amount:.4f}  → {converted:.2f} {base_currency}")
+        total += converted
 
     print(f"ИТОГО: {total:.2f} {base_currency}\n")
 
 def update_rates_cli(source: str = None):
     config = ParserConfig()
     storage = RatesStorage(config.HISTORY_FILE_PATH)
-    cache = RatesCache(file_path=config.RATES_FILE_PATH, ttl_seconds=3600)
 
     clients = []
     if source is None:
@@ -79,7 +60,7 @@ def update_rates_cli(source: str = None):
 
     print("INFO: Starting rates update...")
     try:
-        updater.run_update()
+        updater.run_update(force=True)
         total_rates = len(cache.all_pairs())
         last_refresh = cache.data.get("last_refresh", "N/A")
         print(f"Update successful. Total rates updated: {total_rates}. Last refresh: {last_refresh}")
@@ -110,7 +91,6 @@ def interactive_cli():
 
     config = ParserConfig()
     storage = RatesStorage(config.HISTORY_FILE_PATH)
-    cache = RatesCache(file_path=config.RATES_FILE_PATH, ttl_seconds=3600)
     clients_map = {
         "coingecko": CoinGeckoClient(config),
         "exchangerate": ExchangeRateApiClient(config)
@@ -250,7 +230,7 @@ def interactive_cli():
             updater = RatesUpdater(clients=selected_clients, storage=storage, cache=cache)
             print("INFO: Starting rates update...")
             try:
-                updater.run_update()
+                updater.run_update(force=True)
                 total_rates = len(cache.all_pairs())
                 last_refresh = cache.data.get("last_refresh", "N/A")
                 print(f"Update successful. Total rates updated: {total_rates}. Last refresh: {last_refresh}")
@@ -263,6 +243,8 @@ def interactive_cli():
             print("Неизвестная команда. Попробуйте снова.")
 
 def main():
+    # логирование настраивается при запуске CLI, а не при импорте модулей
+    setup_logging()
     interactive_cli()
 
 
@@ -1,7 +1,5 @@
 from abc import ABC, abstractmethod
-
-class CurrencyNotFoundError(Exception):
-    pass
+from valutatrade_hub.core.exceptions import CurrencyNotFoundError
 
 class Currency(ABC):
     def __init__(self, name: str, code: str):
@@ -61,5 +59,5 @@ def get_currency(code: str) -> Currency:
     code = code.strip().upper()
     factory = _currency_registry.get(code)
     if not factory:
-        raise CurrencyNotFoundError(f"Currency '{code}' not found")
+        raise CurrencyNotFoundError(code)
     return factory()
@@ -1,11 +1,32 @@
 # models.py
+import asyncio
 import hashlib
 import os
 from datetime import datetime
 from copy import deepcopy
-from exceptions import InsufficientFundsError
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+
+EXCHANGE_RATES = {
+    'USD': 1.0,
+    'EUR': 1.1,
+    'BTC': 30000,
+    'ETH': 2000,
+}
+
+def _restore_user(user_id, username, hashed_password, salt, registration_date):
+    # восстановление без повторного хеширования пароля (используется pickle/deepcopy)
+    user = User.__new__(User)
+    user._user_id = user_id
+    user._username = username
+    user._hashed_password = hashed_password
+    user._salt = salt
+    user._registration_date = registration_date
+    return user
+
 
 class User:
+    __slots__ = ("_user_id", "_username", "_salt", "_hashed_password", "_registration_date")
+
     def __init__(self, user_id: int, username: str, password: str, registration_date: datetime = None, salt: str = None):
         self._user_id = user_id
         self.username = username
@@ -13,6 +34,10 @@ class User:
         self._hashed_password = self._hash_password(password)
         self._registration_date = registration_date or datetime.utcnow()
 
+    def __reduce__(self):
+        return (_restore_user, (self._user_id, self._username, self._hashed_password,
+                                self._salt, self._registration_date))
+
     @property
     def user_id(self):
         return self._user_id
@@ -23,9 +48,9 @@ class User:
 
     @username.setter
     def username(self, value: str):
-        if not value:
+        if not isinstance(value, str) or not value.strip():
             raise ValueError("Имя пользователя не может быть пустым")
-        self._username = value
+        self._username = value.strip()
 
     @property
     def registration_date(self):
@@ -56,6 +81,10 @@ class User:
     def verify_password(self, password: str) -> bool:
         return self._hashed_password == self._hash_password(password)
 
+    async def averify_password(self, password: str) -> bool:
+        # хеширование выполняется в отдельном потоке, чтобы не блокировать event loop
+        return await asyncio.to_thread(self.verify_password, password)
+
     def _generate_salt(self, length: int = 8) -> str:
         return os.urandom(length).hex()
 
@@ -64,11 +93,16 @@ class User:
 
 
 class Wallet:
+    __slots__ = ("currency_code", "_balance")
+
     def __init__(self, currency_code: str, balance: float = 0.0):
         self.currency_code = currency_code
         self._balance = 0.0
         self.balance = balance
 
+    def __reduce__(self):
+        return (Wallet, (self.currency_code, self._balance))
+
     @property
     def balance(self) -> float:
         return self._balance
@@ -100,10 +134,15 @@ class Wallet:
         }
 
 class Portfolio:
+    __slots__ = ("_user_id", "_wallets")
+
     def __init__(self, user_id: int, wallets: dict[str, Wallet] = None):
         self._user_id = user_id
         self._wallets = wallets or {}
 
+    def __reduce__(self):
+        return (Portfolio, (self._user_id, self._wallets))
+
     @property
     def user_id(self):
         return self._user_id
@@ -123,22 +162,21 @@ class Portfolio:
             raise KeyError(f"Кошелёк для {currency_code} не найден")
         return self._wallets[currency_code]
 
-    def get_total_value(self, base_currency='USD') -> float:
-
-        exchange_rates = {
-            'USD': 1.0,
-            'EUR': 1.1,
-            'BTC': 30000,
-            'ETH': 2000,
-        }
+    @staticmethod
+    def _prepare_rates(exchange_rates: dict, base_currency: str) -> dict:
+        # один проход: курс к USD сразу переводится в множитель к базовой валюте
+        base_rate = exchange_rates[base_currency]
+        return {code: rate / base_rate for code, rate in exchange_rates.items()}
 
-        if base_currency not in exchange_rates:
+    def get_total_value(self, base_currency='USD') -> float:
+        if base_currency not in EXCHANGE_RATES:
             raise ValueError(f"Базовая валюта {base_currency} не поддерживается")
 
+        multipliers = self._prepare_rates(EXCHANGE_RATES, base_currency)
         total = 0.0
         for code, wallet in self._wallets.items():
-            rate = exchange_rates.get(code)
-            if rate is None:
+            multiplier = multipliers.get(code)
+            if multiplier is None:
                 raise ValueError(f"Нет курса для валюты {code}")
-            total += wallet.balance * rate / exchange_rates[base_currency]
-        return total
\ No newline at end of file
+            total += wallet.balance * multiplier
+        return total
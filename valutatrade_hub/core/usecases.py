@@ -1,80 +1,210 @@
 import os
-import json
+import atexit
+import copy
 import hashlib
+import hmac
+import shutil
+import tempfile
+import threading
 from datetime import datetime
+from functools import lru_cache
 from typing import Any
 from valutatrade_hub.core.currencies import get_currency
 from valutatrade_hub.core.exceptions import InsufficientFundsError, CurrencyNotFoundError
 from valutatrade_hub.decorators import log_action
 from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.infra.database import json_loads, atomic_write_json
 from pathlib import Path
 
 settings = SettingsLoader()
 portfolios_file = Path(settings.get("PORTFOLIOS_FILE", "data/portfolios.json"))
+portfolios_dir = Path(settings.get("PORTFOLIOS_DIR", "data/portfolios"))
 rates_file = Path(settings.get("RATES_FILE", "data/rates.json"))
 users_file = Path(settings.get("USERS_FILE", 'data/users.json'))
+portfolio_flush_delay = float(settings.get("PORTFOLIO_FLUSH_DELAY", 0))
 default_base_currency = settings.get("DEFAULT_BASE_CURRENCY", "USD")
 DEFAULT_BASE_CURRENCY = "USD"
 
-def load_json(path: str) -> Any:
+# кэш разобранных JSON-файлов: path -> ((st_mtime_ns, st_size), data)
+# объекты из кэша не изменяются: наружу load_json отдаёт копии
+_json_cache: dict = {}
+
+def _file_stamp(path) -> tuple:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _load_json_shared(path) -> Any:
+    # общий объект из кэша — только для чтения внутри модуля (индексы пользователей и курсов)
+    key = str(path)
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        stamp = _file_stamp(path)
+        cached = _json_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(path, "rb") as f:
+            raw = f.read()
     except FileNotFoundError:
+        _json_cache.pop(key, None)
         return []
+    # байты разбираются напрямую, без decode/strip-копии; пустой файл считается пустым списком
+    data = json_loads(raw) if raw and not raw.isspace() else []
+    _json_cache[key] = (stamp, data)
+    return data
+
+def load_json(path: str) -> Any:
+    return copy.deepcopy(_load_json_shared(path))
 
 def save_json(path: str, data: Any):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    atomic_write_json(path, data)
+    # в кэш кладётся копия: вызывающий код может дальше менять свой объект
+    _json_cache[str(path)] = (_file_stamp(path), copy.deepcopy(data))
+
+# индекс по username перестраивается только когда в кэше появился новый список
+_users_index = {"users": None, "by_username": {}, "max_user_id": 0}
+
+def _load_users_index() -> dict:
+    users = _load_json_shared(users_file)
+    if users is not _users_index["users"]:
+        _users_index["users"] = users
+        _users_index["by_username"] = {u["username"]: u for u in users}
+        _users_index["max_user_id"] = max((u["user_id"] for u in users), default=0)
+    return _users_index
+
+@lru_cache(maxsize=256)
+def _get_currency_cached(code: str):
+    # реестр валют неизменен, поэтому результат get_currency можно переиспользовать
+    return get_currency(code)
 
 def generate_salt(length=8) -> str:
     return os.urandom(length).hex()
 
-def hash_password(password: str, salt: str) -> str:
-    return hashlib.sha256((password + salt).encode()).hexdigest()
+# новые пароли хешируются scrypt; записи без hash_scheme считаются старым sha256
+PASSWORD_SCHEME = "scrypt"
+LEGACY_PASSWORD_SCHEME = "sha256"
+
+def hash_password(password: str, salt: str, scheme: str = PASSWORD_SCHEME) -> str:
+    if scheme == "scrypt":
+        return hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt),
+                              n=2 ** 14, r=8, p=1, dklen=32).hex()
+    # sha256(password + salt) без промежуточной склеенной строки
+    h = hashlib.sha256(password.encode())
+    h.update(salt.encode())
+    return h.hexdigest()
 
 def now_iso() -> str:
     return datetime.utcnow().isoformat()
 
 def get_rate(from_code: str, to_code: str) -> float:
-    from_code = from_code.upper()
-    to_code = to_code.upper()
-
-    if not rates_file.exists():
+    return _find_rate(from_code.upper(), to_code.upper())
+
+# таблица (from, to) -> rate: прямые и обратные курсы, перестраивается при смене rates.json
+_rate_matrix = {"data": None, "rates": None}
+
+def _load_rate_matrix():
+    data = _load_json_shared(rates_file)
+    if data is not _rate_matrix["data"]:
+        rates = None
+        if data:
+            pairs = data.get("pairs", {})
+            rates = {}
+            for key, pair in pairs.items():
+                from_code, _, to_code = key.partition("_")
+                rates[(from_code, to_code)] = pair["rate"]
+            for (from_code, to_code), rate in list(rates.items()):
+                if rate:
+                    rates.setdefault((to_code, from_code), 1 / rate)
+        _rate_matrix["data"] = data
+        _rate_matrix["rates"] = rates
+    return _rate_matrix["rates"]
+
+def _find_rate(from_code: str, to_code: str) -> float:
+    # коды уже приведены к верхнему регистру вызывающим кодом
+    rates = _load_rate_matrix()
+    if rates is None:
         raise CurrencyNotFoundError(f"Файл курсов {rates_file} не найден")
 
-    with rates_file.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    pairs = data.get("pairs", {})
-
-    pair_key = f"{from_code}_{to_code}"
-    reverse_key = f"{to_code}_{from_code}"
-
-    if pair_key in pairs:
-        return pairs[pair_key]["rate"]
-    elif reverse_key in pairs:
-        return 1 / pairs[reverse_key]["rate"]
-    else:
+    rate = rates.get((from_code, to_code))
+    if rate is None:
         raise CurrencyNotFoundError(f"Курс для {from_code}→{to_code} не найден")
+    return rate
+
+_ready_portfolio_dirs: set = set()
+
+def _migrate_portfolios():
+    # портфели хранятся по одному файлу на пользователя: portfolios_dir/<user_id>.json
+    # старый общий portfolios.json (список) разносится по файлам один раз
+    if portfolios_dir in _ready_portfolio_dirs:
+        return
+    if not portfolios_dir.is_dir():
+        # файлы собираются во временном каталоге и переносятся одной операцией:
+        # если разбор прервётся, каталога портфелей нет и перенос повторится при следующем запуске
+        portfolios_dir.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=portfolios_dir.parent, prefix=f"{portfolios_dir.name}."))
+        try:
+            for portfolio in load_json(portfolios_file):
+                atomic_write_json(tmp_dir / f"{portfolio['user_id']}.json", portfolio)
+            try:
+                os.replace(tmp_dir, portfolios_dir)
+            except OSError:
+                # каталог успел перенести другой процесс
+                if not portfolios_dir.is_dir():
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    _ready_portfolio_dirs.add(portfolios_dir)
+
+def portfolio_path(user_id: int) -> Path:
+    _migrate_portfolios()
+    return portfolios_dir / f"{user_id}.json"
+
+# по умолчанию (portfolio_flush_delay = 0) портфель пишется сразу: операция завершается успехом
+# только после записи, ошибки записи получает вызывающий код.
+# при portfolio_flush_delay > 0 (пакетные сценарии) изменения копятся в памяти (path -> копия записи)
+# и сбрасываются на диск одной пачкой по таймеру или при выходе; при SIGTERM/kill они теряются
+_pending_portfolios: dict = {}
+_portfolio_flush_lock = threading.Lock()
+_portfolio_flush_timer = None
+
+def _load_portfolio(path: Path):
+    pending = _pending_portfolios.get(path)
+    if pending is not None:
+        return copy.deepcopy(pending)
+    return load_json(path)
+
+def _save_portfolio(path: Path, portfolio: dict):
+    global _portfolio_flush_timer
+    if portfolio_flush_delay <= 0:
+        save_json(path, portfolio)
+        return
+    with _portfolio_flush_lock:
+        # копия: вызывающий код может менять свой объект, пока таймер пишет файл
+        _pending_portfolios[path] = copy.deepcopy(portfolio)
+        if _portfolio_flush_timer is None:
+            _portfolio_flush_timer = threading.Timer(portfolio_flush_delay, flush_portfolios)
+            _portfolio_flush_timer.daemon = True
+            _portfolio_flush_timer.start()
+
+def flush_portfolios():
+    global _portfolio_flush_timer
+    with _portfolio_flush_lock:
+        if _portfolio_flush_timer is not None:
+            _portfolio_flush_timer.cancel()
+            _portfolio_flush_timer = None
+        for path, portfolio in _pending_portfolios.items():
+            save_json(path, portfolio)
+        _pending_portfolios.clear()
+
+atexit.register(flush_portfolios)
 
 def read_portfolio(user_id: int) -> dict:
-    portfolios = load_json(portfolios_file)
-    portfolio = next((p for p in portfolios if p["user_id"] == user_id), None)
+    portfolio = _load_portfolio(portfolio_path(user_id))
     if portfolio:
         return {k.upper(): v for k, v in portfolio.get("wallets", {}).items()}
     return {}
 
 def write_portfolio(user_id: int, wallets: dict):
-    portfolios = load_json(portfolios_file)
-    portfolio = next((p for p in portfolios if p["user_id"] == user_id), None)
-    wallets_upper = {k.upper(): v for k, v in wallets.items()}
-    if not portfolio:
-        portfolio = {"user_id": user_id, "wallets": wallets_upper}
-        portfolios.append(portfolio)
-    else:
-        portfolio["wallets"] = wallets_upper
-    save_json(portfolios_file, portfolios)
+    # ключи уже в верхнем регистре: они приходят из read_portfolio и нормализованных кодов buy/sell
+    _save_portfolio(portfolio_path(user_id), {"user_id": user_id, "wallets": wallets})
 
 @log_action("REGISTER")
 def register(username: str, password: str):
@@ -84,23 +214,29 @@ def register(username: str, password: str):
     if len(password) < 4:
         raise ValueError("Пароль должен быть не короче 4 символов")
 
-    users = load_json(users_file)
-    if any(u["username"] == username for u in users):
+    index = _load_users_index()
+    if username in index["by_username"]:
         raise ValueError(f"Имя пользователя '{username}' уже занято")
 
-    user_id = max([u["user_id"] for u in users] + [0]) + 1
+    user_id = index["max_user_id"] + 1
     salt = generate_salt()
     hashed_password = hash_password(password, salt)
-    registration_date = datetime.utcnow().isoformat()
+    registration_date = now_iso()
 
-    users.append({
+    record = {
         "user_id": user_id,
         "username": username,
         "hashed_password": hashed_password,
+        "hash_scheme": PASSWORD_SCHEME,
         "salt": salt,
         "registration_date": registration_date
-    })
-    save_json(users_file, users)
+    }
+    # новый список вместо append: кэш и индекс меняются только после успешной записи
+    save_json(users_file, [*index["users"], record])
+    users = _load_json_shared(users_file)
+    index["users"] = users
+    index["by_username"][username] = users[-1]
+    index["max_user_id"] = user_id
 
     return {
         "user_id": user_id,
@@ -117,8 +253,9 @@ def login(username: str, password: str):
     if not user:
         raise ValueError(f"Пользователь '{username}' не найден")
 
-    hashed_input = hash_password(password, user["salt"])
-    if hashed_input != user["hashed_password"]:
+    scheme = user.get("hash_scheme", LEGACY_PASSWORD_SCHEME)
+    hashed_input = hash_password(password, user["salt"], scheme)
+    if not hmac.compare_digest(hashed_input, user["hashed_password"]):
         raise ValueError("Неверный пароль")
 
     return {
@@ -128,16 +265,12 @@ def login(username: str, password: str):
     }
 
 def get_user_by_username(username: str):
-    users = load_json(users_file)
-    for u in users:
-        if u["username"] == username:
-            return u
-    return None
+    user = _load_users_index()["by_username"].get(username)
+    return dict(user) if user is not None else None
 
 
 def get_user_portfolio(user_id: int) -> dict:
-    portfolios = load_json(portfolios_file)
-    portfolio = next((p for p in portfolios if p["user_id"] == user_id), None)
+    portfolio = _load_portfolio(portfolio_path(user_id))
     if portfolio:
         return portfolio.get("wallets", {})
     return {}
@@ -148,20 +281,18 @@ def deposit(user_id: int, currency: str, amount: float):
     if amount <= 0:
         raise ValueError("'amount' должен быть положительным числом")
 
-    portfolios = load_json(portfolios_file)
-    portfolio = next((p for p in portfolios if p["user_id"] == user_id), None)
-    if portfolio is None:
+    currency = currency.upper()
+    path = portfolio_path(user_id)
+    portfolio = _load_portfolio(path)
+    if not portfolio:
         portfolio = {"user_id": user_id, "wallets": {}}
-        portfolios.append(portfolio)
-
-    wallets = portfolio["wallets"]
-    wallets[currency] = wallets.get(currency, {"balance": 0.0})
-    old_balance = wallets[currency]["balance"]
 
-    wallets[currency]["balance"] += amount
-    new_balance = wallets[currency]["balance"]
+    wallet = portfolio["wallets"].setdefault(currency, {"balance": 0.0})
+    old_balance = wallet["balance"]
+    new_balance = old_balance + amount
+    wallet["balance"] = new_balance
 
-    save_json(portfolios_file, portfolios)
+    _save_portfolio(path, portfolio)
 
     return {
         "old_balance": old_balance,
@@ -181,27 +312,27 @@ def buy(user_id: int, currency_code: str, amount: float, base_currency: str = No
 
     # валидируем валюту
     try:
-        get_currency(currency_code)
-        get_currency(base_currency)
+        _get_currency_cached(currency_code)
+        _get_currency_cached(base_currency)
     except CurrencyNotFoundError as e:
         raise e
 
     wallets = read_portfolio(user_id)
-    wallets[currency_code] = wallets.get(currency_code, {"balance": 0.0})
-    old_balance = wallets[currency_code]["balance"]
+    target_wallet = wallets.setdefault(currency_code, {"balance": 0.0})
+    old_balance = target_wallet["balance"]
 
     # получаем курс
-    rate = get_rate(currency_code, base_currency)
+    rate = _find_rate(currency_code, base_currency)
 
     cost_in_base = amount * rate
-    wallets[base_currency] = wallets.get(base_currency, {"balance": 0.0})
-    if cost_in_base > wallets[base_currency]["balance"]:
-        raise InsufficientFundsError(wallets[base_currency]["balance"], cost_in_base, base_currency)
+    base_wallet = wallets.setdefault(base_currency, {"balance": 0.0})
+    if cost_in_base > base_wallet["balance"]:
+        raise InsufficientFundsError(base_wallet["balance"], cost_in_base, base_currency)
 
     # обновляем кошельки
-    wallets[base_currency]["balance"] -= cost_in_base
-    wallets[currency_code]["balance"] += amount
-    new_balance = wallets[currency_code]["balance"]
+    base_wallet["balance"] -= cost_in_base
+    new_balance = old_balance + amount
+    target_wallet["balance"] = new_balance
 
     write_portfolio(user_id, wallets)
 
@@ -226,32 +357,33 @@ def sell(user_id: int, currency_code: str, amount: float, base_currency: str = N
         raise ValueError("'amount' должен быть > 0")
 
     try:
-        get_currency(currency_code)
-        get_currency(base_currency)
+        _get_currency_cached(currency_code)
+        _get_currency_cached(base_currency)
     except CurrencyNotFoundError as e:
         raise e
 
     wallets = read_portfolio(user_id)
-    if currency_code not in wallets or wallets[currency_code]["balance"] <= 0:
+    target_wallet = wallets.get(currency_code)
+    if target_wallet is None or target_wallet["balance"] <= 0:
         raise CurrencyNotFoundError(f"Валюта '{currency_code}' не поддерживается или отсутствует в портфеле.")
 
-    old_balance = wallets[currency_code]["balance"]
+    old_balance = target_wallet["balance"]
     if amount > old_balance:
         raise InsufficientFundsError(old_balance, amount, currency_code)
 
     # получаем курс
-    rate = get_rate(currency_code, base_currency)
+    rate = _find_rate(currency_code, base_currency)
     revenue_in_base = amount * rate
 
-    wallets[currency_code]["balance"] -= amount
-    wallets[base_currency] = wallets.get(base_currency, {"balance": 0.0})
-    wallets[base_currency]["balance"] += revenue_in_base
+    new_balance = old_balance - amount
+    target_wallet["balance"] = new_balance
+    wallets.setdefault(base_currency, {"balance": 0.0})["balance"] += revenue_in_base
 
     write_portfolio(user_id, wallets)
 
     return {
         "old_balance": old_balance,
-        "new_balance": wallets[currency_code]["balance"],
+        "new_balance": new_balance,
         "amount": amount,
         "currency": currency_code,
         "rate": rate,
@@ -266,24 +398,19 @@ def get_rate_usecase(from_code: str, to_code: str):
     to_code = to_code.upper()
 
     try:
-        get_currency(from_code)
-        get_currency(to_code)
+        _get_currency_cached(from_code)
+        _get_currency_cached(to_code)
     except CurrencyNotFoundError as e:
         raise e
 
-    rates = load_json(rates_file)
-    pairs = rates.get("pairs", {})
+    pairs = _load_json_shared(rates_file).get("pairs", {})
 
-    pair_key = f"{from_code}_{to_code}"
-    reverse_key = f"{to_code}_{from_code}"
+    rate_data = pairs.get(f"{from_code}_{to_code}")
+    if rate_data is not None:
+        return dict(rate_data)
 
-    if pair_key in pairs:
-        rate_data = pairs[pair_key]
-    elif reverse_key in pairs:
-        rate_data = pairs[reverse_key]
-        rate_data = {"rate": 1 / rate_data["rate"], "updated_at": rate_data["updated_at"], "source": rate_data.get("source")}
-    else:
+    reverse = pairs.get(f"{to_code}_{from_code}")
+    if reverse is None:
         raise CurrencyNotFoundError(f"{from_code}→{to_code}")
-
-    return rate_data
+    return {"rate": 1 / reverse["rate"], "updated_at": reverse["updated_at"], "source": reverse.get("source")}
 
@@ -1,50 +1,133 @@
-import json
+import mmap
+import os
+import time
 from pathlib import Path
-from datetime import datetime, timezone, timedelta
-import tempfile
+from datetime import datetime, timezone
+from functools import lru_cache
+from valutatrade_hub.infra.database import json_loads, atomic_write_json
+
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    parse_datetime = datetime.fromisoformat
+
+
+@lru_cache(maxsize=1024)
+def _pair_key(from_currency, to_currency):
+    # ключ пары вида "BTC_USD"; набор валют мал, поэтому ключи берутся из кэша
+    return f"{from_currency.upper()}_{to_currency.upper()}"
+
 
 class RatesCache:
     def __init__(self, file_path="data/rates.json", ttl_seconds=3600):
         self.file_path = Path(file_path)
-        self.ttl = timedelta(seconds=ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self._dirty = False
         self.data = self._load_file()
 
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
     def _load_file(self):
-        if not self.file_path.exists():
-            return {"pairs": {}, "last_refresh": None}
-        with open(self.file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        try:
+            with open(self.file_path, "rb") as f:
+                st = os.fstat(f.fileno())
+                self._stamp = (st.st_mtime_ns, st.st_size)
+                if st.st_size:
+                    # файл отображается в память и разбирается без копирования в bytes
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                        return json_loads(view)
+        except FileNotFoundError:
+            self._stamp = None
+        return {"pairs": {}, "last_refresh": None}
+
+    def _reload_if_changed(self):
+        # rates.json мог обновить другой процесс (например, планировщик);
+        # несохранённые изменения при этом не затираем
+        if not self._dirty and self._file_stamp() != self._stamp:
+            self.data = self._load_file()
+
+    @staticmethod
+    def _pair_epoch(pair):
+        # свежесть сравниваем по epoch; у старых записей без него
+        # ISO-строка разбирается один раз и результат запоминается в записи
+        epoch = pair.get("updated_at_epoch")
+        if epoch is None:
+            epoch = pair["updated_at_epoch"] = parse_datetime(pair["updated_at"]).timestamp()
+        return epoch
 
     def get_pair(self, from_currency, to_currency):
-        key = f"{from_currency.upper()}_{to_currency.upper()}"
+        self._reload_if_changed()
+        key = _pair_key(from_currency, to_currency)
         pair = self.data.get("pairs", {}).get(key)
         if not pair:
             return None
 
-        updated_at = datetime.fromisoformat(pair["updated_at"])
-        if datetime.now(timezone.utc) - updated_at > self.ttl:
+        if time.time() - self._pair_epoch(pair) > self.ttl_seconds:
             return None
         return pair
 
-    def update_pair(self, from_currency, to_currency, rate, source, updated_at=None):
-        updated_at = updated_at or datetime.now(timezone.utc).isoformat()
-        key = f"{from_currency.upper()}_{to_currency.upper()}"
-        current = self.data.get("pairs", {}).get(key)
-
-        if not current or datetime.fromisoformat(updated_at) > datetime.fromisoformat(current["updated_at"]):
-            self.data.setdefault("pairs", {})[key] = {
-                "rate": rate,
-                "updated_at": updated_at,
-                "source": source
-            }
-            self.data["last_refresh"] = datetime.now(timezone.utc).isoformat()
+    def get_rates(self, codes, base_currency):
+        # курсы для набора валют к одной базе за один проход: now вычисляется один раз
+        self._reload_if_changed()
+        base = base_currency.upper()
+        pairs = self.data.get("pairs", {})
+        now = time.time()
+        rates = {}
+        for code in codes:
+            if code.upper() == base:
+                rates[code] = 1.0
+                continue
+            pair = pairs.get(_pair_key(code, base))
+            if pair and now - self._pair_epoch(pair) <= self.ttl_seconds:
+                rates[code] = pair["rate"]
+            else:
+                rates[code] = None
+        return rates
+
+    def update_pairs(self, rates, source, updated_at=None):
+        # пачка (from, to, rate) от одного источника: время разбирается и файл проверяется один раз;
+        # время обновления обычно передаёт RatesUpdater, часы читаются только если его нет
+        # изменения только в памяти: после вызова нужен flush(), иначе они не попадут в файл
+        if updated_at is None:
+            epoch = time.time()
+            updated_at = datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+        elif isinstance(updated_at, datetime):
+            epoch = updated_at.timestamp()
+            updated_at = updated_at.isoformat()
+        else:
+            epoch = parse_datetime(updated_at).timestamp()
+        self._reload_if_changed()
+        pairs = self.data.setdefault("pairs", {})
+
+        for from_currency, to_currency, rate in rates:
+            key = _pair_key(from_currency, to_currency)
+            current = pairs.get(key)
+            if not current or epoch > self._pair_epoch(current):
+                pairs[key] = {
+                    "rate": rate,
+                    "updated_at": updated_at,
+                    "updated_at_epoch": epoch,
+                    "source": source
+                }
+                self.data["last_refresh"] = updated_at
+                # запись на диск откладывается до flush(): кэш курсов можно восстановить
+                self._dirty = True
+
+    def flush(self):
+        if self._dirty:
             self._save_file()
+            self._dirty = False
 
     def _save_file(self):
-        with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8") as tmp_file:
-            json.dump(self.data, tmp_file, indent=2, ensure_ascii=False)
-            tmp_name = tmp_file.name
-        Path(tmp_name).replace(self.file_path)
+        # запись раз в цикл обновления через общий atomic_write_json
+        atomic_write_json(self.file_path, self.data)
+        self._stamp = self._file_stamp()
 
     def all_pairs(self):
+        self._reload_if_changed()
         return self.data.get("pairs", {})
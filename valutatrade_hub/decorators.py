@@ -11,40 +11,61 @@ file_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 
 
+LOGGED_PARAMS = ("username", "user_id", "currency", "currency_code", "amount", "base_currency")
+
+
 def log_action(action: str, verbose: bool = True):
     def decorator(func):
+        #позиции параметров вычисляются один раз при декорировании, а не на каждый вызов
+        code = func.__code__
+        param_names = code.co_varnames[:code.co_argcount]
+        param_idx = {name: i for i, name in enumerate(param_names) if name in LOGGED_PARAMS}
+
+        def pick(name, args, kwargs):
+            # значение параметра напрямую из kwargs или args, без промежуточного словаря
+            if name in kwargs:
+                return kwargs[name]
+            i = param_idx.get(name)
+            if i is not None and i < len(args):
+                return args[i]
+            return None
+
+        def describe(args, kwargs):
+            return (
+                action,
+                pick("username", args, kwargs) or pick("user_id", args, kwargs) or "unknown",
+                pick("currency", args, kwargs) or pick("currency_code", args, kwargs) or "",
+                pick("amount", args, kwargs) or 0.0,
+                kwargs.get("rate", 0),
+                pick("base_currency", args, kwargs) or "",
+            )
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            username = kwargs.get("username") or "unknown"
-            currency = kwargs.get("currency") or ""
-            amount = kwargs.get("amount") or 0.0
-            base = kwargs.get("base_currency") or ""
             old_balance = kwargs.get("old_balance")
             new_balance = kwargs.get("new_balance")
+            show_balance = verbose and old_balance is not None and new_balance is not None
 
             try:
                 result = func(*args, **kwargs)
-                log_msg = (
-                    f"{action} user='{username}' currency='{currency}' "
-                    f"amount={amount} rate={kwargs.get('rate', 0)} base='{base}' "
-                    f"result=OK"
-                )
-                if verbose and old_balance is not None and new_balance is not None:
-                    log_msg += f" ({old_balance:.4f} → {new_balance:.4f})"
-
-                logger.info(log_msg)
-                return result
             except Exception as e:
-                log_msg = (
-                    f"{action} user='{username}' currency='{currency}' "
-                    f"amount={amount} rate={kwargs.get('rate', 0)} base='{base}' "
-                    f"result=ERROR error_type={type(e).__name__} "
-                    f"error_message='{str(e)}'"
-                )
-                if verbose and old_balance is not None and new_balance is not None:
-                    log_msg += f" ({old_balance:.4f} → ???)"
-                logger.error(log_msg)
+                #сообщение собирается, только если уровень ERROR включён
+                if logger.isEnabledFor(logging.ERROR):
+                    logger.error(
+                        "%s user='%s' currency='%s' amount=%s rate=%s base='%s' "
+                        "result=ERROR error_type=%s error_message='%s'%s",
+                        *describe(args, kwargs), type(e).__name__, e,
+                        f" ({old_balance:.4f} → ???)" if show_balance else "",
+                    )
                 raise
 
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "%s user='%s' currency='%s' amount=%s rate=%s base='%s' result=OK%s",
+                    *describe(args, kwargs),
+                    f" ({old_balance:.4f} → {new_balance:.4f})" if show_balance else "",
+                )
+            return result
+
         return wrapper
     return decorator
@@ -1,5 +1,82 @@
 # valutatrade_hub/infra/database.py
+import json
+import os
+import tempfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(raw: bytes) -> Any:
+    #orjson, если установлен, иначе стандартный json
+    if orjson is not None:
+        return orjson.loads(raw)
+    if isinstance(raw, memoryview):
+        # стандартный json не принимает memoryview
+        raw = raw.tobytes()
+    return json.loads(raw)
+
+
+def _json_default(value: Any) -> Any:
+    #как orjson: datetime/date сериализуются в ISO-строку
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def json_dumps(data: Any) -> bytes:
+    #компактная запись без indent: pretty-print занимает большую часть времени dump
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"),
+                      default=_json_default).encode("utf-8")
+
+
+# umask читается один раз при импорте: os.umask меняет его для всего процесса
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _target_mode(path: Path) -> int:
+    #mkstemp создаёт файл с правами 0600; заменённый файл сохраняет права прежнего,
+    #новый получает обычные 0666 с учётом umask
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_json(path, data: Any):
+    atomic_write_bytes(path, json_dumps(data))
+
+
+def atomic_write_bytes(path, payload: bytes):
+    #запись во временный файл рядом с целевым, fsync и атомарная замена: при сбое файл не повреждается.
+    #имя временного файла уникально для каждого писателя, поэтому параллельные записи не мешают друг другу
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, _target_mode(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        # удаляем только свой временный файл
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
 
 class DatabaseManager:
     def __init__(self, db_url="sqlite:///data/db.sqlite3"):
-        self.db_url = db_url
\ No newline at end of file
+        self.db_url = db_url
@@ -1,4 +1,9 @@
-import toml
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+    import toml
+from types import MappingProxyType
 from typing import Any
 
 class SettingsLoader:
@@ -6,7 +11,7 @@ class SettingsLoader:
     #Singleton для конфигурации проекта.
     #Загружает секцию [tool.valutatrade] из pyproject.toml и кэширует.
     _instance = None
-    _settings: dict = {}
+    _settings = MappingProxyType({})
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -16,11 +21,17 @@ class SettingsLoader:
 
     def _load_settings(self):
         try:
-            with open("pyproject.toml", "r", encoding="utf-8") as f:
-                data = toml.load(f)
-            self._settings = data.get("tool", {}).get("valutatrade", {})
+            if tomllib is not None:
+                with open("pyproject.toml", "rb") as f:
+                    data = tomllib.load(f)
+            else:
+                with open("pyproject.toml", "r", encoding="utf-8") as f:
+                    data = toml.load(f)
+            settings = data.get("tool", {}).get("valutatrade", {})
         except FileNotFoundError:
-            self._settings = {}
+            settings = {}
+        #настройки только для чтения: общий экземпляр нельзя случайно изменить
+        self._settings = MappingProxyType(settings)
 
     def get(self, key: str, default: Any = None) -> Any:
         return self._settings.get(key, default)
@@ -1,15 +1,35 @@
+import atexit
 import logging
 import logging.config
-import json
-from datetime import datetime
-from valutatrade_hub.infra import settings
+import logging.handlers
+import queue
+import time
+from valutatrade_hub.infra.database import json_dumps
+from valutatrade_hub.infra.settings import SettingsLoader
+
+#настройки логирования читаются один раз при импорте
+settings = SettingsLoader()
+LOG_FORMAT = settings.get("LOG_FORMAT", "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+LOG_LEVEL = settings.get("LOG_LEVEL", "INFO").upper()
+LOG_PATH = settings.get("LOG_PATH", "valutatrade.log")
 
 
 class JSONFormatter(logging.Formatter):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        #секунда последней записи и её строка: записи одной секунды форматируют дату один раз
+        self._last_second = (None, "")
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        if second != self._last_second[0]:
+            self._last_second = (second, time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(second)))
+        return f"{self._last_second[1]}.{int((created - second) * 1e6):06d}"
+
     def format(self, record: logging.LogRecord) -> str:
         log_data = {
-            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -24,7 +44,8 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, 'currency'):
             log_data['currency'] = record.currency
 
-        return json.dumps(log_data, ensure_ascii=False)
+        #orjson, если установлен (см. infra.database.json_dumps)
+        return json_dumps(log_data).decode("utf-8")
 
 
 def setup_logging():
@@ -34,7 +55,7 @@ def setup_logging():
         "disable_existing_loggers": False,
         "formatters": {
             "simple": {
-                "format": settings.get("log_format", "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+                "format": LOG_FORMAT
             },
             "json": {
                 "()": JSONFormatter
@@ -51,7 +72,7 @@ def setup_logging():
                 "class": "logging.FileHandler",
                 "level": "DEBUG",
                 "formatter": "json",
-                "filename": settings.get("log_file", "valutatrade.log"),
+                "filename": LOG_PATH,
                 "encoding": "utf-8",
                 "mode": "a"
             },
@@ -66,7 +87,7 @@ def setup_logging():
         },
         "loggers": {
             "valutatrade": {
-                "level": settings.get("log_level", "INFO").upper(),
+                "level": LOG_LEVEL,
                 "handlers": ["console", "file"],
                 "propagate": False
             },
@@ -87,12 +108,29 @@ def setup_logging():
     except Exception as e:
         print(f" Не удалось настроить файловое логирование: {e}")
         logging.basicConfig(
-            level=getattr(logging, settings.get("log_level", "INFO").upper()),
-            format=settings.get("log_format", "%(levelname)s - %(message)s")
+            level=getattr(logging, LOG_LEVEL),
+            format=LOG_FORMAT
         )
+    else:
+        _offload_file_handlers("valutatrade", "valutatrade.actions")
+
+
+def _offload_file_handlers(*logger_names):
+    #запись в файлы переносится в фоновый поток: вызывающий код только кладёт запись в очередь
+    #у каждого логгера своя очередь, чтобы записи не попадали в чужие файлы
+    for name in logger_names:
+        target = logging.getLogger(name)
+        file_handlers = [h for h in target.handlers if isinstance(h, logging.FileHandler)]
+        if not file_handlers:
+            continue
+        log_queue = queue.SimpleQueue()
+        for handler in file_handlers:
+            target.removeHandler(handler)
+        target.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(log_queue, *file_handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
 
 
 logger = logging.getLogger("valutatrade")
 actions_logger = logging.getLogger("valutatrade.actions")
-
-setup_logging()
\ No newline at end of file
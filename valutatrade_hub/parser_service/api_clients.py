@@ -1,41 +1,110 @@
 # valutatrade_hub/parser_service/api_clients.py
+import atexit
+import time
 import requests
 from abc import ABC, abstractmethod
+from typing import Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from .config import ParserConfig
-
-class ApiRequestError(Exception):
-    pass
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.infra.database import json_loads
+
+# одна сессия на процесс: TCP/TLS-соединения переиспользуются между обновлениями,
+# временные сбои (429/5xx) повторяются с нарастающей паузой, Retry-After учитывается
+_SESSION = requests.Session()
+_SESSION.headers.update({"Accept": "application/json", "User-Agent": "valutatrade-hub"})
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=2,
+    pool_maxsize=4,
+    max_retries=Retry(
+        total=ParserConfig.REQUEST_RETRIES,
+        backoff_factor=0.3,
+        # случайная добавка к паузе, чтобы повторы разных процессов не совпадали
+        backoff_jitter=0.2,
+        backoff_max=30,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    ),
+))
+# пул соединений закрывается при завершении процесса
+atexit.register(_SESSION.close)
 
 class BaseApiClient(ABC):
+    # валидаторы последнего успешного ответа для условного GET
+    _etag = None
+    _last_modified = None
+    _last_rates = None
+    _fetched_at = 0.0
+    cache_ttl = 0
+
     @abstractmethod
-    def fetch_rates(self) -> dict:
+    def fetch_rates(self, force: bool = False) -> Optional[dict]:
+        # {(from_currency, to_currency): rate}; None — запрос пропущен, данные источника ещё свежие.
+        # force=True игнорирует TTL (явное обновление пользователем)
         pass
 
+    @property
+    def etag(self):
+        return self._etag
+
+    def _is_fresh(self) -> bool:
+        # последний ответ ещё в пределах TTL источника: повторный запрос не нужен
+        return self._last_rates is not None and time.monotonic() - self._fetched_at < self.cache_ttl
+
+    def _conditional_get(self, url: str, timeout: int):
+        # если данные не менялись, сервер отвечает 304 без тела
+        headers = {}
+        if self._last_rates is not None:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+        return _SESSION.get(url, timeout=timeout, headers=headers)
+
+    def _remember(self, response, rates: dict) -> dict:
+        self._etag = response.headers.get("ETag")
+        self._last_modified = response.headers.get("Last-Modified")
+        self._last_rates = rates
+        return rates
+
+    def mark_consumed(self):
+        # отсчёт TTL начинается, когда вызывающий код забрал курсы, а не когда пришёл ответ:
+        # результат, пришедший после таймаута обновления, не считается свежим
+        self._fetched_at = time.monotonic()
+
 class CoinGeckoClient(BaseApiClient):
     def __init__(self, config: ParserConfig):
         self.config = config
-
-    def fetch_rates(self) -> dict:
-        ids = ",".join([self.config.CRYPTO_ID_MAP[t] for t in self.config.CRYPTO_CURRENCIES])
-        vs_currency = self.config.BASE_FIAT_CURRENCY.lower()
-        url = f"{self.config.COINGECKO_URL}?ids={ids}&vs_currencies={vs_currency}"
-
+        self.cache_ttl = config.CRYPTO_CACHE_TTL
+        # конфигурация неизменяема, поэтому URL собирается один раз
+        ids = ",".join([config.CRYPTO_ID_MAP[t] for t in config.CRYPTO_CURRENCIES])
+        self._vs_currency = config.BASE_FIAT_CURRENCY.lower()
+        self._url = f"{config.COINGECKO_URL}?ids={ids}&vs_currencies={self._vs_currency}"
+
+    def fetch_rates(self, force: bool = False) -> Optional[dict]:
+        if not force and self._is_fresh():
+            return None
+        vs_currency = self._vs_currency
         try:
-            response = requests.get(url, timeout=self.config.REQUEST_TIMEOUT)
+            response = self._conditional_get(self._url, timeout=self.config.REQUEST_TIMEOUT)
+            if response.status_code == 304:
+                return dict(self._last_rates)
             response.raise_for_status()
-            data = response.json()
+            data = json_loads(response.content)
 
             rates = {}
             for ticker, cg_id in self.config.CRYPTO_ID_MAP.items():
-                if cg_id in data:
-                    pair = f"{ticker}_{self.config.BASE_FIAT_CURRENCY}"
-                    rates[pair] = data[cg_id][vs_currency]
+                quote = data.get(cg_id)
+                if quote is not None:
+                    rates[(ticker, self.config.BASE_FIAT_CURRENCY)] = quote[vs_currency]
 
-            return rates
+            return self._remember(response, rates)
 
         except requests.exceptions.RequestException as e:
             raise ApiRequestError(f"Ошибка запроса к CoinGecko: {e}")
-        except KeyError as e:
+        except (KeyError, ValueError) as e:
             raise ApiRequestError(f"Ошибка обработки данных CoinGecko: {e}")
 
 class ExchangeRateApiClient(BaseApiClient):
@@ -43,13 +112,18 @@ class ExchangeRateApiClient(BaseApiClient):
         if not config.EXCHANGERATE_API_KEY:
             raise ValueError("Не указан API-ключ для ExchangeRate-API")
         self.config = config
+        self.cache_ttl = config.FIAT_CACHE_TTL
+        self._url = f"{config.EXCHANGERATE_API_URL}/{config.EXCHANGERATE_API_KEY}/latest/{config.BASE_FIAT_CURRENCY}"
 
-    def fetch_rates(self) -> dict:
-        url = f"{self.config.EXCHANGERATE_API_URL}/{self.config.EXCHANGERATE_API_KEY}/latest/{self.config.BASE_FIAT_CURRENCY}"
+    def fetch_rates(self, force: bool = False) -> Optional[dict]:
+        if not force and self._is_fresh():
+            return None
         try:
-            resp = requests.get(url, timeout=self.config.REQUEST_TIMEOUT)
+            resp = self._conditional_get(self._url, timeout=self.config.REQUEST_TIMEOUT)
+            if resp.status_code == 304:
+                return dict(self._last_rates)
             resp.raise_for_status()
-            data = resp.json()
+            data = json_loads(resp.content)
 
             if data.get("result") != "success":
                 raise ApiRequestError(f"Ошибка ExchangeRate-API: {data.get('error-type', 'Unknown error')}")
@@ -58,14 +132,18 @@ class ExchangeRateApiClient(BaseApiClient):
             if not rates:
                 raise ApiRequestError("Ошибка ExchangeRate-API: отсутствует поле 'conversion_rates'")
 
+            # обходим короткий список нужных валют, а не весь ответ API (150+ валют)
+            base = self.config.BASE_FIAT_CURRENCY
             filtered = {
-                f"{curr}_{self.config.BASE_FIAT_CURRENCY}": rate
-                for curr, rate in rates.items()
-                if curr in self.config.FIAT_CURRENCIES
+                (curr, base): rates[curr]
+                for curr in self.config.FIAT_CURRENCIES
+                if curr in rates
             }
 
-            return filtered
+            return self._remember(resp, filtered)
 
         except requests.exceptions.RequestException as e:
             raise ApiRequestError(f"Ошибка сети ExchangeRate-API: {e}")
+        except ValueError as e:
+            raise ApiRequestError(f"Некорректный ответ ExchangeRate-API: {e}")
 
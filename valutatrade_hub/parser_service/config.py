@@ -28,6 +28,13 @@ class ParserConfig:
     })
 
     RATES_FILE_PATH: str = "data/rates.json"
-    HISTORY_FILE_PATH: str = "data/exchange_rates.json"
+    HISTORY_FILE_PATH: str = "data/exchange_rates.jsonl"
 
     REQUEST_TIMEOUT: int = 10
+    REQUEST_RETRIES: int = 3
+    # общий предел ожидания ответов всех клиентов за один цикл обновления, сек.
+    FETCH_TIMEOUT: int = 60
+
+    # минимальный интервал между запросами к источнику, сек.: крипта меняется чаще фиата
+    CRYPTO_CACHE_TTL: int = 60
+    FIAT_CACHE_TTL: int = 900
@@ -1,12 +1,15 @@
 # valutatrade_hub/parser_service/scheduler.py
 import schedule
-import time
+import signal
 import threading
 import logging
 from typing import Optional
 
+from .api_clients import CoinGeckoClient, ExchangeRateApiClient
+from .storage import RatesStorage
 from .updater import RatesUpdater
 from .config import ParserConfig
+from valutatrade_hub.core.utils import RatesCache
 
 logger = logging.getLogger(__name__)
 
@@ -15,23 +18,29 @@ class RatesScheduler:
 
     def __init__(self, config: Optional[ParserConfig] = None):
         self.config = config or ParserConfig()
-        self.updater = RatesUpdater(self.config)
+        self.updater = RatesUpdater(
+            clients=[CoinGeckoClient(self.config), ExchangeRateApiClient(self.config)],
+            storage=RatesStorage(self.config.HISTORY_FILE_PATH),
+            cache=RatesCache(file_path=self.config.RATES_FILE_PATH),
+        )
         self.scheduler_thread: Optional[threading.Thread] = None
         self.stop_event = threading.Event()
 
     def scheduled_update(self):
         logger.info("Running scheduled rates update...")
         try:
-            result = self.update.update_rates()
+            result = self.updater.run_update()
 
             # Логируем результат
             if result["total_rates"] > 0:
-                logger.info(f"Scheduled update successful: {result['total_rates']} rates updated")
+                logger.info("Scheduled update successful: %d rates updated", result["total_rates"])
+            elif result["skipped_sources"]:
+                logger.info("Scheduled update skipped: source data is still fresh")
             else:
                 logger.warning("Scheduled update completed but no rates were updated")
 
         except Exception as e:
-            logger.error(f"Error in scheduled update: {e}")
+            logger.error("Error in scheduled update: %s", e)
 
     def start(self, interval_minutes: int = 15):
 
@@ -41,10 +50,12 @@ class RatesScheduler:
 
         schedule.every(interval_minutes).minutes.do(self.scheduled_update)
 
+        # сброс до первого обновления: SIGTERM во время него не теряется
+        self.stop_event.clear()
+
         logger.info("Running initial update...")
         self.scheduled_update()
 
-        self.stop_event.clear()
         self.scheduler_thread = threading.Thread(
             target=self._scheduler_loop,
             daemon=True,
@@ -52,14 +63,19 @@ class RatesScheduler:
         )
         self.scheduler_thread.start()
 
-        logger.info(f"Scheduler started with {interval_minutes} minute interval")
+        logger.info("Scheduler started with %s minute interval", interval_minutes)
 
     def _scheduler_loop(self):
         logger.info("Scheduler loop started")
 
         while not self.stop_event.is_set():
             schedule.run_pending()
-            time.sleep(60)
+            # спим ровно до следующей задачи (не дольше минуты); stop() будит поток сразу
+            delay = schedule.idle_seconds()
+            if delay is None:
+                delay = 60
+            if delay > 0:
+                self.stop_event.wait(timeout=min(delay, 60))
 
         logger.info("Scheduler loop stopped")
 
@@ -71,4 +87,15 @@ class RatesScheduler:
             logger.info("Scheduler stopped")
 
     def run_once(self):
-        return self.updater.update_rates()
\ No newline at end of file
+        return self.updater.run_update()
+
+    def serve_forever(self, interval_minutes: int = 15):
+        # долгоживущий процесс: клиенты, HTTP-сессия и кэш курсов остаются прогретыми между циклами
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop_event.set())
+        try:
+            self.start(interval_minutes)
+            self.stop_event.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
@@ -1,23 +1,46 @@
-import json
+import gzip
+import os
+import shutil
+import threading
+from collections import deque
+from datetime import datetime
 from pathlib import Path
-import tempfile
+from valutatrade_hub.infra.database import json_loads, json_dumps, atomic_write_bytes
 
 class RatesStorage:
-    def __init__(self, file_path="data/exchange_rates.json"):
+    # история курсов в формате JSON Lines: одна запись на строку, новые записи дописываются в конец
+    # сколько последних id держать в памяти: в id входит время ответа, поэтому
+    # повтор возможен только для недавних записей, а не для всей истории
+    recent_ids = 1000
+
+    def __init__(self, file_path="data/exchange_rates.jsonl", max_bytes=10 * 1024 * 1024):
         self.file_path = Path(file_path)
+        self.max_bytes = max_bytes
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._ids = None
+        self._id_order = deque(maxlen=self.recent_ids)
         if not self.file_path.exists():
-            self.file_path.write_text("[]")
+            # старый exchange_rates.json (список) переносится в новый файл один раз;
+            # файл появляется только после успешного разбора, иначе перенос повторится при следующем запуске
+            try:
+                with open(self.file_path.with_suffix(".json"), "rb") as legacy:
+                    records = json_loads(legacy.read())
+            except FileNotFoundError:
+                records = []
+            atomic_write_bytes(self.file_path, b"".join(json_dumps(r) + b"\n" for r in records))
 
     def save_rates(self, rates):
-        existing = self.load_all()
+        # id последних записей читаются из файла один раз, дальше поддерживаются в памяти
+        if self._ids is None:
+            self._ids = set()
+            for r in self.load_all()[-self.recent_ids:]:
+                self._remember_id(r["id"])
 
         new_records = []
-        existing_ids = {r["id"] for r in existing}
         for r in rates:
             iso_ts = r["timestamp"]
             record_id = f"{r['from_currency'].upper()}{r['to_currency'].upper()}_{iso_ts}"
-            if record_id not in existing_ids:
+            if record_id not in self._ids:
                 record = r.copy()
                 record["id"] = record_id
                 record["meta"] = {
@@ -27,15 +50,39 @@ class RatesStorage:
                     "etag": r.get("meta", {}).get("etag", "")
                 }
                 new_records.append(record)
+                self._remember_id(record_id)
+
+        if new_records:
+            with open(self.file_path, "ab") as f:
+                f.write(b"".join(json_dumps(r) + b"\n" for r in new_records))
+                size = f.tell()
+            if self.max_bytes and size > self.max_bytes:
+                self._rotate()
 
-        all_records = existing + new_records
+    def _remember_id(self, record_id):
+        # самый старый id вытесняется, и множество не растёт в долгоживущем процессе
+        if len(self._id_order) == self._id_order.maxlen:
+            self._ids.discard(self._id_order[0])
+        self._id_order.append(record_id)
+        self._ids.add(record_id)
 
-        with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8") as tmp_file:
-            json.dump(all_records, tmp_file, indent=2, ensure_ascii=False)
-            tmp_name = tmp_file.name
+    def _rotate(self):
+        # заполненный файл переименовывается и сжимается в фоне; запись продолжается в новый файл.
+        # load_all читает только текущий файл, архивы — exchange_rates.<время>.jsonl.gz
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+        segment = self.file_path.with_name(f"{self.file_path.stem}.{stamp}{self.file_path.suffix}")
+        # имя сегмента уникально до микросекунд, поэтому прошлые сегменты не перезаписываются
+        os.rename(self.file_path, segment)
+        self.file_path.touch()
+        threading.Thread(target=self._compress, args=(segment,), name="RatesHistoryRotate").start()
 
-        Path(tmp_name).replace(self.file_path)
+    @staticmethod
+    def _compress(segment: Path):
+        gz_path = segment.with_name(segment.name + ".gz")
+        with open(segment, "rb") as src, gzip.open(gz_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.unlink(segment)
 
     def load_all(self):
-        with open(self.file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
\ No newline at end of file
+        with open(self.file_path, "rb") as f:
+            return [json_loads(line) for line in f if line.strip()]
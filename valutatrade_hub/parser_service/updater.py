@@ -1,4 +1,6 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FetchTimeoutError
 from datetime import datetime, timezone
 
 from .api_clients import BaseApiClient, ApiRequestError
@@ -16,41 +18,81 @@ class RatesUpdater:
         self.cache = cache
         self.config = ParserConfig()
 
-    def run_update(self):
+    def run_update(self, force: bool = False):
+        # force=True — явное обновление: TTL источников не учитывается
         logger.info("START rates update ")
-        all_rates = []
+        # (from, to) -> запись; если пару вернули несколько клиентов, остаётся ответ клиента,
+        # стоящего в списке позже
+        all_rates = {}
+        received = 0
+        skipped = 0
+        consumed = []
 
+        # клиенты опрашиваются параллельно: время обновления равно самому долгому запросу, а не сумме
+        pool = ThreadPoolExecutor(max_workers=max(1, len(self.clients)))
+        futures = []
         for client in self.clients:
-            client_name = client.__class__.__name__
+            client_name = type(client).__name__
+            logger.info("Запрос курсов от %s...", client_name)
+            futures.append((client, client_name, pool.submit(client.fetch_rates, force)))
+        # зависший клиент не держит цикл дольше FETCH_TIMEOUT: его результат просто не ждём
+        pool.shutdown(wait=False)
+        deadline = time.monotonic() + self.config.FETCH_TIMEOUT
+
+        for client, client_name, future in futures:
             try:
-                logger.info(f"Запрос курсов от {client_name}...")
-                rates = client.fetch_rates()
-                logger.info(f"Получено {len(rates)} курсов от {client_name}")
+                rates = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                if rates is None:
+                    logger.info("Данные %s ещё свежие, запрос пропущен", client_name)
+                    skipped += 1
+                    continue
+                consumed.append(client)
+                logger.info("Получено %d курсов от %s", len(rates), client_name)
 
                 timestamp = datetime.now(timezone.utc).isoformat()
+                meta = {"etag": client.etag or ""}
+                received += len(rates)
 
-                for pair, rate in rates.items():
-                    from_curr, to_curr = pair.split("_")
-                    record = {
+                for (from_curr, to_curr), rate in rates.items():
+                    all_rates[(from_curr, to_curr)] = {
                         "from_currency": from_curr,
                         "to_currency": to_curr,
                         "rate": rate,
                         "timestamp": timestamp,
-                        "source": client_name
+                        "source": client_name,
+                        "meta": meta
                     }
-                    all_rates.append(record)
-
-                    self.cache.update_pair(from_curr, to_curr, rate, source=client_name, updated_at=timestamp)
 
             except ApiRequestError as e:
-                logger.error(f"Ошибка клиента {client_name}: {e}")
+                logger.error("Ошибка клиента %s: %s", client_name, e)
+            except FetchTimeoutError:
+                # поток клиента не прерывается; его поздний ответ не отмечается как свежий
+                logger.error("Клиент %s не ответил за %s с", client_name, self.config.FETCH_TIMEOUT)
             except Exception as e:
-                logger.exception(f"Неожиданная ошибка при запросе {client_name}: {e}")
+                logger.exception("Неожиданная ошибка при запросе %s: %s", client_name, e)
+
+        if received > len(all_rates):
+            logger.info("Дубликаты пар отброшены: получено %d, уникальных %d", received, len(all_rates))
+
+        # в кэш — одной пачкой на источник (у каждого клиента своё время ответа)
+        batches = {}
+        for (from_curr, to_curr), record in all_rates.items():
+            batches.setdefault((record["source"], record["timestamp"]), []).append((from_curr, to_curr, record["rate"]))
+        for (source, timestamp), batch in batches.items():
+            self.cache.update_pairs(batch, source=source, updated_at=timestamp)
+        self.cache.flush()
 
         if all_rates:
-            self.storage.save_rates(all_rates)
-            logger.info(f"Сохранено {len(all_rates)} новых записей в history file")
+            self.storage.save_rates(all_rates.values())
+            logger.info("Сохранено %d новых записей в history file", len(all_rates))
+        elif skipped == len(self.clients):
+            logger.info("Все источники ещё свежие, обновлять нечего")
         else:
             logger.warning("Нет новых курсов для сохранения")
 
-        logger.info("FINISH rates update")
\ No newline at end of file
+        # источники считаются свежими только после записи их курсов в кэш и историю
+        for client in consumed:
+            client.mark_consumed()
+
+        logger.info("FINISH rates update")
+        return {"total_rates": len(all_rates), "skipped_sources": skipped}
\ No newline at end of file